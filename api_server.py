@@ -1,24 +1,41 @@
 # api_server.py
 import os
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, Response
 from sqlalchemy.future import select
+from sqlalchemy import delete
 from sqlalchemy.exc import IntegrityError
-from myagents.db import async_session, NewsItem
+from sqlalchemy.orm import selectinload
+from myagents.db import engine, async_session, NewsItem, NewsBody, NewsUrl
+from myagents.events import broadcaster
+from myagents.partitions import ensure_partitions
+from myagents.serialization import NEWS_COLUMNS, encode_news_rows, json_encoder
+from myagents.trending import get_trending, get_timeline, parse_window
 from dotenv import load_dotenv
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The Procfile only runs the API, so make sure this month's partitions exist here too
+    await ensure_partitions()
+    # One event listener per worker, shared by every stream client
+    await broadcaster.start()
+    yield
+    await broadcaster.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Load env variables
 load_dotenv()
 
 # === Serializer ===
-def serialize_news(news: NewsItem):
-    return {
+def serialize_news(news: NewsItem, include_content: bool = False):
+    data = {
         "id": news.id,
         "title": news.title,
         "source": news.source,
         "published_at": news.published_at.isoformat() if news.published_at else None,
-        "content": news.content,
         "summary": news.summary,
         "tags": news.tags,
         "symbols": news.symbols,
@@ -26,6 +43,10 @@ def serialize_news(news: NewsItem):
         "provider": news.provider,
         "publisher": news.publisher  # Added publisher field
     }
+    # Article bodies are only loaded (and decompressed) when explicitly asked for
+    if include_content:
+        data["content"] = news.body.text if news.body else None
+    return data
 
 # === Basic Routes ===
 @app.get("/")
@@ -34,46 +55,121 @@ def home():
 
 @app.get("/news")
 async def list_news():
-    async with async_session() as session:
-        result = await session.execute(select(NewsItem))
-        news_list = result.scalars().all()
-        return [serialize_news(n) for n in news_list]
+    # Core rows of just the needed columns (no ORM objects), encoded straight to bytes
+    async with engine.connect() as conn:
+        result = await conn.execute(select(*NEWS_COLUMNS))
+        return Response(encode_news_rows(result.all()), media_type="application/json")
+
+# === Live updates (SSE / WebSocket) ===
+SSE_KEEPALIVE_SECONDS = 15
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['kind']}\ndata: {json_encoder.encode(event).decode()}\n\n"
+
+@app.get("/news/stream")
+async def stream_news(
+    request: Request,
+    last_event_id: int | None = None,
+    last_event_id_header: int | None = Header(None, alias="Last-Event-ID"),
+):
+    """Server-Sent Events for collected/summarized/tagged/published items. Resumes from Last-Event-ID."""
+    resume_from = last_event_id_header if last_event_id_header is not None else last_event_id
+
+    async def event_source():
+        queue = broadcaster.subscribe()  # subscribe before replay so nothing falls in the gap
+        last_sent = resume_from or 0
+        try:
+            async for event in broadcaster.replay(resume_from):
+                last_sent = event["id"]
+                yield format_sse(event)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:  # dropped for falling behind; the browser reconnects with Last-Event-ID
+                    break
+                if event["id"] <= last_sent:  # already sent by the replay
+                    continue
+                last_sent = event["id"]
+                yield format_sse(event)
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/news/ws")
+async def news_websocket(websocket: WebSocket, last_event_id: int | None = None):
+    await websocket.accept()
+    queue = broadcaster.subscribe()
+    last_sent = last_event_id or 0
+    try:
+        async for event in broadcaster.replay(last_event_id):
+            last_sent = event["id"]
+            await websocket.send_json(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.send_json({"kind": "keep-alive"})  # also surfaces dead sockets
+                continue
+            if event is None:
+                await websocket.close(code=1013)  # try again later, resuming from last id
+                break
+            if event["id"] <= last_sent:  # already sent by the replay
+                continue
+            last_sent = event["id"]
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(queue)
 
 @app.get("/news/{news_id}")
 async def get_news(news_id: int):
     async with async_session() as session:
-        result = await session.execute(select(NewsItem).where(NewsItem.id == news_id))
+        result = await session.execute(
+            select(NewsItem).options(selectinload(NewsItem.body)).where(NewsItem.id == news_id)
+        )
         news = result.scalar_one_or_none()
         if not news:
             raise HTTPException(status_code=404, detail="News not found")
-        return serialize_news(news)
+        return serialize_news(news, include_content=True)
 
 @app.post("/news")
 async def create_news(news_item: dict):
     async with async_session() as session:
-        new_news = NewsItem(**news_item)
+        content = news_item.pop("content", None)
+        new_news = NewsItem(**news_item, body=NewsBody.from_text(content))
         session.add(new_news)
         try:
             await session.commit()
-            await session.refresh(new_news)
         except IntegrityError:
             await session.rollback()
             raise HTTPException(status_code=400, detail="News with this URL already exists")
-        return serialize_news(new_news)
+        return serialize_news(new_news, include_content=True)
 
 @app.patch("/news/{news_id}")
 async def update_news(news_id: int, updates: dict):
     async with async_session() as session:
-        result = await session.execute(select(NewsItem).where(NewsItem.id == news_id))
+        result = await session.execute(
+            select(NewsItem).options(selectinload(NewsItem.body)).where(NewsItem.id == news_id)
+        )
         news = result.scalar_one_or_none()
         if not news:
             raise HTTPException(status_code=404, detail="News not found")
+        if "content" in updates:
+            news.body = NewsBody.from_text(updates.pop("content"))
         for key, value in updates.items():
-            if hasattr(news, key):
+            if hasattr(news, key) and key != "body":
                 setattr(news, key, value)
         await session.commit()
-        await session.refresh(news)
-        return serialize_news(news)
+        return serialize_news(news, include_content=True)
 
 @app.delete("/news/{news_id}")
 async def delete_news(news_id: int):
@@ -83,9 +179,37 @@ async def delete_news(news_id: int):
         if not news:
             raise HTTPException(status_code=404, detail="News not found")
         await session.delete(news)
+        # news_items is partitioned, so there are no FK cascades to clean these up
+        await session.execute(delete(NewsBody).where(NewsBody.news_id == news_id))
+        await session.execute(delete(NewsUrl).where(NewsUrl.news_id == news_id))
         await session.commit()
         return {"message": "Deleted successfully"}
 
+# === Trending symbols / tags (served from trend_counts rollups) ===
+TREND_KINDS = ("symbol", "tag")
+
+def parse_trend_args(kind: str, window: str):
+    if kind not in TREND_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(TREND_KINDS)}")
+    try:
+        return parse_window(window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/symbols/trending")
+async def trending_symbols(window: str = "1h", kind: str = "symbol", limit: int = 20):
+    window_delta = parse_trend_args(kind, window)
+    items = await get_trending(kind, window_delta, limit=min(max(limit, 1), 200))
+    return {"kind": kind, "window": window, "items": items}
+
+@app.get("/symbols/{symbol}/timeline")
+async def symbol_timeline(symbol: str, window: str = "24h", granularity: str = "hour", kind: str = "symbol"):
+    window_delta = parse_trend_args(kind, window)
+    if granularity not in ("minute", "hour"):
+        raise HTTPException(status_code=400, detail="granularity must be 'minute' or 'hour'")
+    points = await get_timeline(kind, symbol, window_delta, granularity)
+    return {"kind": kind, "key": symbol, "window": window, "granularity": granularity, "points": points}
+
 # === Agent Endpoints ===
 @app.post("/run-collector")
 async def run_collector_endpoint():
@@ -118,6 +242,7 @@ async def run_pipeline_endpoint():
     from myagents.taggeragent import run_tagger
     from myagents.publisheragent import run_publisher
 
+    await ensure_partitions()  # a long-running API can cross into a month nobody created yet
     collected = await run_collector()
     summarized = await run_agent()
     tagged = await run_tagger()
@@ -0,0 +1,72 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import random
+import time
+
+from myagents.extractive import compress_batch, compress_texts, estimate_tokens, POOL_CHUNK, TOKEN_BUDGET
+
+# Extractive pre-compression: how many prompt tokens it saves per article compared
+# with sending the whole body, and how long it takes per 1,000 articles, in-process
+# and through the worker pool used by the summarizer.
+# Articles are synthetic (seeded), sized like typical newspaper3k output.
+# Usage: uv run python benchmarks/extractive_bench.py
+
+N_ARTICLES = 5_000
+SNIPPET_CHARS = 320  # what the summarizer used to send (clean_html limit)
+
+WORDS = (
+    "apple tesla nvidia microsoft fed inflation rates earnings revenue guidance shares stock market "
+    "investors analysts quarter growth profit margin outlook bitcoin crypto etf treasury yields dollar "
+    "oil prices demand supply chips ai data center cloud sales forecast billion percent rally selloff "
+    "regulators tariffs china europe jobs report consumer spending recession bonds volatility index"
+).split()
+FILLER = "the a of to in and on for with as by that from at is was were has have".split()
+
+def make_sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS if rng.random() < 0.45 else FILLER) for _ in range(rng.randint(8, 28))]
+    return " ".join(words).capitalize() + rng.choice(".....!?")
+
+def make_article(rng: random.Random) -> tuple[str, str]:
+    title = " ".join(rng.choice(WORDS) for _ in range(8)).title()
+    paragraphs = [
+        " ".join(make_sentence(rng) for _ in range(rng.randint(2, 5)))
+        for _ in range(rng.randint(6, 20))
+    ]
+    return title, "\n\n".join(paragraphs)
+
+def per_1k(seconds: float, n: int) -> float:
+    return seconds / n * 1000
+
+def main():
+    rng = random.Random(42)
+    articles = [make_article(rng) for _ in range(N_ARTICLES)]
+
+    start = time.perf_counter()
+    compressed = []
+    for i in range(0, len(articles), POOL_CHUNK):
+        compressed.extend(compress_batch(articles[i:i + POOL_CHUNK]))
+    in_process = time.perf_counter() - start
+
+    async def pooled():
+        await compress_texts(articles[:POOL_CHUNK])  # spin the workers up outside the timing
+        start = time.perf_counter()
+        await compress_texts(articles)
+        return time.perf_counter() - start
+    pool_seconds = asyncio.run(pooled())
+
+    full = sum(estimate_tokens(text) for _, text in articles) / N_ARTICLES
+    snippet = sum(estimate_tokens(text[:SNIPPET_CHARS]) for _, text in articles) / N_ARTICLES
+    kept = sum(estimate_tokens(text) for text in compressed) / N_ARTICLES
+
+    print(f"{N_ARTICLES} articles, budget {TOKEN_BUDGET} tokens/item (~4 chars/token), {os.cpu_count()} CPUs")
+    print(f"{'full body tokens/item':<30} {full:>10.0f}")
+    print(f"{'RSS snippet tokens/item':<30} {snippet:>10.0f}")
+    print(f"{'compressed tokens/item':<30} {kept:>10.0f}")
+    print(f"{'tokens saved/item vs body':<30} {full - kept:>10.0f} ({1 - kept / full:.0%})")
+    print(f"{'ms per 1k, in-process':<30} {per_1k(in_process, N_ARTICLES) * 1000:>10.1f}")
+    print(f"{'ms per 1k, worker pool':<30} {per_1k(pool_seconds, N_ARTICLES) * 1000:>10.1f}")
+
+if __name__ == "__main__":
+    main()
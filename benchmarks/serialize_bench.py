@@ -0,0 +1,76 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from api_server import serialize_news
+from myagents.db import NewsItem
+from myagents.serialization import encode_news_rows
+
+# Microbenchmark: old /news path (ORM NewsItem -> serialize_news dict -> FastAPI's
+# jsonable_encoder + json.dumps) vs. the Core row + msgspec path.
+# ORM objects are built up front, so DB hydration/identity-map cost is NOT counted
+# here; the real-world gap is larger than what this prints.
+# Usage: uv run python benchmarks/serialize_bench.py
+
+SIZES = (1_000, 10_000, 100_000)
+
+def make_rows(n: int) -> list[tuple]:
+    base = datetime(2025, 1, 1)
+    return [
+        (
+            i,
+            f"Headline number {i} about markets",
+            "CNBC",
+            base + timedelta(minutes=i),
+            "• First bullet point\n• Second bullet point\n• Third bullet point",
+            ["earnings", "tech"],
+            ["AAPL", "MSFT"],
+            f"https://example.com/news/{i}",
+            "rss",
+            bool(i % 2),
+        )
+        for i in range(n)
+    ]
+
+def make_orm_items(rows: list[tuple]) -> list[NewsItem]:
+    keys = ("id", "title", "source", "published_at", "summary", "tags", "symbols", "url", "provider", "publisher")
+    return [NewsItem(**dict(zip(keys, row))) for row in rows]
+
+def old_path(items: list[NewsItem]) -> bytes:
+    content = jsonable_encoder([serialize_news(n) for n in items])
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def new_path(rows: list[tuple]) -> bytes:
+    return encode_news_rows(rows)
+
+def measure(fn, arg, repeat: int = 3) -> tuple[float, int]:
+    """Best wall time of `repeat` runs, plus peak traced allocation of one run."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def main():
+    print(f"{'rows':>8} {'path':<14} {'rows/sec':>12} {'peak alloc MiB':>15}")
+    for n in SIZES:
+        rows = make_rows(n)
+        items = make_orm_items(rows)
+        assert json.loads(old_path(items[:50])) == json.loads(new_path(rows[:50]))
+        for label, fn, arg in (("serialize_news", old_path, items), ("core+msgspec", new_path, rows)):
+            seconds, peak = measure(fn, arg)
+            print(f"{n:>8} {label:<14} {n / seconds:>12,.0f} {peak / 2**20:>15.1f}")
+
+if __name__ == "__main__":
+    main()
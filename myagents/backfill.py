@@ -0,0 +1,360 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from openai import RateLimitError, APIConnectionError, APITimeoutError
+from rich.progress import Progress, BarColumn, MofNCompleteColumn, TextColumn, TimeElapsedColumn, TimeRemainingColumn
+from sqlalchemy import select, update, func, and_, or_
+
+from myagents.db import async_session, NewsItem, utcnow, load_contents, STAGE_SUMMARIZED, STAGE_TAGGED, STAGE_PUBLISHED
+from myagents.extractive import compress_texts
+from myagents.summarizeragent import stream_summaries, SUMMARY_PROMPT_VERSION
+from myagents.taggeragent import stream_tags, TAG_PROMPT_VERSION
+from myagents.jsonstream import stream_each
+from myagents.trending import bump_trending, HOUR_RETENTION
+
+# Re-run the summarizer or tagger over historical rows after a prompt/model change.
+# Rows are walked in fixed id-range chunks; finished chunks (and the rows already
+# rewritten in chunks that had failures) go into a checkpoint file, so an interrupted
+# run picks up where it stopped and only failed rows go back to the LLM. Only rows the live pipeline has
+# already moved past the stage are touched, stage/attempts are left alone and no
+# stream events are sent.
+#
+# Usage:
+#   uv run python -m myagents.backfill summarize --stale --dry-run
+#   uv run python -m myagents.backfill tag --since 2025-01-01 --source CNBC --workers 4 --rpm 60
+
+DEFAULT_RPM = int(os.getenv("BACKFILL_RPM", "15"))  # Gemini free tier
+LLM_RETRIES = 3
+
+ROW_COLUMNS = (
+    NewsItem.id,
+    NewsItem.published_at,
+    NewsItem.title,
+    NewsItem.summary,
+    NewsItem.symbols,
+    NewsItem.tags,
+)
+
+STAGES = {
+    "summarize": {
+        "version": NewsItem.summary_version,
+        "current": SUMMARY_PROMPT_VERSION,
+        "stages": (STAGE_SUMMARIZED, STAGE_TAGGED, STAGE_PUBLISHED),
+    },
+    "tag": {
+        "version": NewsItem.tags_version,
+        "current": TAG_PROMPT_VERSION,
+        "stages": (STAGE_TAGGED, STAGE_PUBLISHED),
+    },
+}
+
+# === Helpers ===
+class RateLimiter:
+    """Spaces request starts evenly so all workers together stay under `per_minute`."""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60 / per_minute
+        self._next = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        await asyncio.sleep(start - now)
+
+def build_filter(args):
+    spec = STAGES[args.stage]
+    version = spec["version"]
+    clauses = [NewsItem.stage.in_(spec["stages"])]
+    if args.since:
+        clauses.append(NewsItem.published_at >= args.since)
+    if args.until:
+        clauses.append(NewsItem.published_at < args.until)
+    if args.source:
+        clauses.append(NewsItem.source.in_(args.source))
+    if args.stale:
+        clauses.append(or_(version.is_(None), version != spec["current"]))
+    elif args.prompt_version:
+        clauses.append(version.is_(None) if args.prompt_version == "none" else version == args.prompt_version)
+    return and_(*clauses)
+
+def job_key(args) -> dict:
+    """What a checkpoint belongs to; resuming with different filters would skip the wrong chunks."""
+    return {
+        "stage": args.stage,
+        "since": args.since.isoformat() if args.since else None,
+        "until": args.until.isoformat() if args.until else None,
+        "source": sorted(args.source or []),
+        "prompt_version": args.prompt_version,
+        "stale": args.stale,
+        "chunk_size": args.chunk_size,
+    }
+
+def load_checkpoint(path: str) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, state: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)  # atomic, so a kill mid-write never leaves a broken checkpoint
+
+async def chunk_counts(where, first_id: int, last_id: int, chunk_size: int) -> dict[int, int]:
+    """Matching rows per chunk in one query; empty chunks never show up."""
+    chunk = ((NewsItem.id - first_id) // chunk_size).label("chunk")
+    async with async_session() as session:
+        rows = await session.execute(
+            select(chunk, func.count())
+            .where(where, NewsItem.id.between(first_id, last_id))
+            .group_by("chunk")  # by output name, so Postgres doesn't compare two sets of bound params
+        )
+        return {int(c): n for c, n in rows}
+
+# === Backfill ===
+class Backfill:
+    def __init__(self, args, where, state: dict, progress: Progress, task):
+        self.args = args
+        self.where = where
+        self.state = state
+        self.limiter = RateLimiter(args.rpm)
+        self.progress = progress
+        self.task = task
+        self.written = 0
+        self.failed = 0
+
+    async def limited(self, stream, rows):
+        """stream(rows) under the shared rate limit; transient API errors are retried until an element arrives."""
+        for attempt in range(LLM_RETRIES + 1):
+            await self.limiter.wait()
+            started = False
+            try:
+                async for element in stream(rows):
+                    started = True
+                    yield element
+                return
+            except (RateLimitError, APIConnectionError, APITimeoutError) as e:
+                if started or attempt == LLM_RETRIES:
+                    raise
+                delay = 10 * 2 ** attempt
+                self.progress.console.log(f"⚠️ {type(e).__name__}, retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def collect(self, stream, batch) -> dict[int, tuple]:
+        """row id → streamed values, with the live pipeline's per-item retries (see stream_each)."""
+        results = {}
+
+        async def keep(row, *values):
+            results[row.id] = values
+
+        _, error = await stream_each(batch, lambda rows: self.limited(stream, rows), keep)
+        if error:
+            self.progress.console.log(f"❌ LLM call for {len(batch) - len(results)} rows failed: {error}")
+        return results
+
+    async def summarize_batch(self, batch, texts: dict[int, str]) -> tuple[list[dict], list]:
+        # Same input as the live summarizer: key sentences of the stored body
+        def stream(rows):
+            return stream_summaries(rows, [texts[row.id] for row in rows])
+
+        results = await self.collect(stream, batch)
+        updates = [
+            {
+                "id": row.id,
+                "published_at": row.published_at,
+                "summary": results[row.id][0],
+                "summary_version": SUMMARY_PROMPT_VERSION,
+            }
+            for row in batch
+            if row.id in results
+        ]
+        return updates, []
+
+    async def tag_batch(self, batch) -> tuple[list[dict], list]:
+        results = await self.collect(stream_tags, batch)
+        updates, retract = [], []
+        for row in batch:
+            if row.id not in results:
+                continue
+            symbols, tags = results[row.id]
+            updates.append({
+                "id": row.id,
+                "published_at": row.published_at,
+                "symbols": symbols,
+                "tags": tags,
+                "tags_version": TAG_PROMPT_VERSION,
+            })
+            retract.append((row.published_at, row.symbols, row.tags))
+        return updates, retract
+
+    async def run_chunk(self, chunk: int) -> tuple[bool, list[int]]:
+        """Rewrite one chunk; returns whether every row made it, and the ids written."""
+        first = self.state["first_id"] + chunk * self.args.chunk_size
+        range_filter = [NewsItem.id >= first, NewsItem.id < first + self.args.chunk_size]
+        written = self.state["written"].get(str(chunk))
+        if written:  # at most chunk_size ids, so the IN list stays small
+            range_filter.append(NewsItem.id.not_in(written))
+        async with async_session() as session:
+            rows = (await session.execute(
+                select(*ROW_COLUMNS).where(self.where, *range_filter).order_by(NewsItem.id)
+            )).all()
+            bodies = await load_contents(session, [r.id for r in rows]) if self.args.stage == "summarize" else {}
+        texts = {}
+        if self.args.stage == "summarize":
+            compressed = await compress_texts([(r.title, bodies.get(r.id) or r.summary or "") for r in rows])
+            texts = dict(zip((r.id for r in rows), compressed))
+
+        updates, retract, failed = [], [], 0
+        for i in range(0, len(rows), self.args.batch_size):
+            batch = rows[i:i + self.args.batch_size]
+            try:
+                if self.args.stage == "summarize":
+                    done, old = await self.summarize_batch(batch, texts)
+                else:
+                    done, old = await self.tag_batch(batch)
+            except Exception as e:
+                self.progress.console.log(f"❌ chunk {chunk}: batch of {len(batch)} failed: {e}")
+                done, old = [], []
+            updates.extend(done)
+            retract.extend(old)
+            failed += len(batch) - len(done)
+            self.progress.advance(self.task, len(batch))
+
+        if updates:
+            async with async_session() as session:
+                # ORM bulk UPDATE by primary key: one executemany, and the published_at
+                # half of the key lets Postgres prune to a single partition per row.
+                await session.execute(update(NewsItem), updates)
+                if self.args.stage == "tag":
+                    since = utcnow() - HOUR_RETENTION
+                    await bump_trending(session, [e for e in retract if e[0] >= since], delta=-1)
+                    await bump_trending(session, [
+                        (u["published_at"], u["symbols"], u["tags"]) for u in updates if u["published_at"] >= since
+                    ])
+                await session.commit()
+
+        self.written += len(updates)
+        self.failed += failed
+        self.progress.update(self.task, description=f"{self.args.stage} ✅ {self.written} ❌ {self.failed}")
+        # A chunk with failures stays pending; its written ids are skipped on resume
+        return failed == 0, [u["id"] for u in updates]
+
+    async def worker(self, queue: asyncio.Queue):
+        while True:
+            try:
+                chunk = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            complete, written = await self.run_chunk(chunk)
+            if complete:
+                self.state["done"].append(chunk)
+                self.state["written"].pop(str(chunk), None)
+            elif written:
+                self.state["written"].setdefault(str(chunk), []).extend(written)
+            else:
+                continue
+            save_checkpoint(self.args.checkpoint, self.state)
+
+async def dry_run(args, where, pending: dict[int, int]):
+    rows = sum(pending.values())
+    calls = sum(-(-n // args.batch_size) for n in pending.values())
+    version = STAGES[args.stage]["version"]
+    async with async_session() as session:
+        versions = (await session.execute(
+            select(version, func.count()).where(where).group_by(version)
+        )).all()
+    print(f"Dry run: {args.stage} would rewrite {rows} rows in {len(pending)} chunks ({calls} LLM calls).")
+    print("By current prompt version: " + ", ".join(f"{v or 'none'}={n}" for v, n in versions))
+    print(f"Estimated time at {args.rpm} requests/min: {calls / args.rpm:.1f} min")
+
+async def backfill(args):
+    where = build_filter(args)
+    key = job_key(args)
+
+    state = None if args.restart else load_checkpoint(args.checkpoint)
+    if state is not None and state["job"] != key:
+        print(f"{args.checkpoint} belongs to a different backfill: {state['job']}")
+        print("Use the same options to resume it, or --restart to start over.")
+        return
+    if state is None:
+        async with async_session() as session:
+            first_id, last_id = (await session.execute(
+                select(func.min(NewsItem.id), func.max(NewsItem.id)).where(where)
+            )).one()
+        if first_id is None:
+            print("No rows match.")
+            return
+        # Bounds are fixed up front: rows collected later are the live pipeline's job
+        state = {"job": key, "first_id": first_id, "last_id": last_id, "done": []}
+    # chunk → ids already rewritten in chunks that still have failed rows
+    state.setdefault("written", {})
+
+    done = set(state["done"])
+    counts = await chunk_counts(where, state["first_id"], state["last_id"], args.chunk_size)
+    if not (args.stale or args.prompt_version):
+        # Rewritten rows still match the filter unless it selects by prompt version
+        for chunk, ids in state["written"].items():
+            if int(chunk) in counts:
+                counts[int(chunk)] = max(counts[int(chunk)] - len(ids), 0)
+    pending = {chunk: n for chunk, n in sorted(counts.items()) if chunk not in done and n}
+    if not pending:
+        print(f"Nothing left to backfill ({len(done)} chunks done, see {args.checkpoint}).")
+        return
+    if args.dry_run:
+        await dry_run(args, where, pending)
+        return
+
+    save_checkpoint(args.checkpoint, state)
+    queue = asyncio.Queue()
+    for chunk in pending:
+        queue.put_nowait(chunk)
+
+    columns = (
+        TextColumn("{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TimeElapsedColumn(),
+        TextColumn("ETA"),
+        TimeRemainingColumn(),
+    )
+    with Progress(*columns) as progress:
+        task = progress.add_task(args.stage, total=sum(pending.values()))
+        job = Backfill(args, where, state, progress, task)
+        await asyncio.gather(*(job.worker(queue) for _ in range(args.workers)))
+
+    remaining = len(pending) - (len(state["done"]) - len(done))
+    print(f"Rewrote {job.written} rows, {job.failed} failed; {remaining} chunks left in {args.checkpoint}.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m myagents.backfill", description="Re-summarize or re-tag stored news.")
+    parser.add_argument("stage", choices=list(STAGES))
+    parser.add_argument("--since", type=datetime.fromisoformat, help="published_at >= this (UTC, e.g. 2025-01-01)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="published_at < this (UTC)")
+    parser.add_argument("--source", action="append", help="only this source; repeat for several")
+    versions = parser.add_mutually_exclusive_group()
+    versions.add_argument("--stale", action="store_true", help="only rows not written by the current prompt version")
+    versions.add_argument("--prompt-version", help="only rows written by this prompt version ('none' = untracked)")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent LLM requests")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_RPM, help="LLM requests per minute across all workers")
+    parser.add_argument("--batch-size", type=int, default=10, help="items per LLM request")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="ids per checkpointed chunk")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: backfill_<stage>.json)")
+    parser.add_argument("--restart", action="store_true", help="ignore any existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="count what would be rewritten and exit")
+    args = parser.parse_args(argv)
+    args.checkpoint = args.checkpoint or f"backfill_{args.stage}.json"
+    for name in ("workers", "rpm", "batch_size", "chunk_size"):
+        if getattr(args, name) <= 0:
+            parser.error(f"--{name.replace('_', '-')} must be positive")
+    return args
+
+if __name__ == "__main__":
+    asyncio.run(backfill(parse_args()))
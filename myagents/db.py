@@ -1,9 +1,12 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base, mapped_column, Mapped
-from sqlalchemy import String, Integer, Text, DateTime, ARRAY, Boolean
-from datetime import datetime
+from sqlalchemy.orm import sessionmaker, declarative_base, mapped_column, Mapped, relationship, validates
+from sqlalchemy import String, Integer, Text, DateTime, ARRAY, Boolean, LargeBinary, Index, event, and_, or_
+from datetime import datetime, timezone, timedelta
 import logging
+import zlib
 from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from myagents.urls import canonicalize_url
 
 #==================db=======================
 import os
@@ -18,24 +21,211 @@ async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False
 
 Base = declarative_base()
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# --- Pipeline stages ---
+# Each item moves collected → summarized → tagged → published. A failed attempt keeps
+# the item at its current stage, bumps attempts and pushes next_retry_at out
+# (exponential backoff); after MAX_ATTEMPTS it is parked as "failed".
+STAGE_COLLECTED = "collected"
+STAGE_SUMMARIZED = "summarized"
+STAGE_TAGGED = "tagged"
+STAGE_PUBLISHED = "published"
+STAGE_FAILED = "failed"
+
+MAX_ATTEMPTS = int(os.getenv("PIPELINE_MAX_ATTEMPTS", "5"))
+RETRY_BASE = timedelta(minutes=int(os.getenv("PIPELINE_RETRY_MINUTES", "30")))
+
 class NewsItem(Base):
     __tablename__ = "news_items"
+    # Monthly range partitions are created/retired by myagents.partitions.
+    # Postgres needs the partition key in the primary key, and can't enforce a
+    # global UNIQUE(url) on a partitioned table, so URL uniqueness lives in news_urls.
+    __table_args__ = (
+        Index("ix_news_items_stage", "stage", "next_retry_at"),
+        {"postgresql_partition_by": "RANGE (published_at)"},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(Text, nullable=False)
     source: Mapped[str] = mapped_column(String(100), nullable=True)
-    published_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
-    content: Mapped[str] = mapped_column(Text, nullable=True)
+    published_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True, default=utcnow)
     summary: Mapped[str] = mapped_column(Text, nullable=True)
     tags: Mapped[list[str]] = mapped_column(ARRAY(String), default=[])
     symbols: Mapped[list[str]] = mapped_column(ARRAY(String), default=[])
-    url: Mapped[str] = mapped_column(String(500), unique=True, nullable=False)
+    url: Mapped[str] = mapped_column(String(500), nullable=False)
+    # Dedupe key (see myagents.urls); filled from url on insert when not given
+    canonical_url: Mapped[str | None] = mapped_column(String(500), nullable=True)
     provider: Mapped[str] = mapped_column(String(50), nullable=True)
     publisher: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    stage: Mapped[str] = mapped_column(String(20), default=STAGE_COLLECTED, server_default=STAGE_COLLECTED, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    next_retry_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Prompt version that produced summary/tags (SUMMARY_PROMPT_VERSION / TAG_PROMPT_VERSION);
+    # NULL for rows written before versions were tracked.
+    summary_version: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    tags_version: Mapped[str | None] = mapped_column(String(20), nullable=True)
+
+    # Full article text lives compressed in news_bodies and is only loaded on request,
+    # e.g. select(NewsItem).options(selectinload(NewsItem.body)) or load_content().
+    # No FK is possible against a partitioned parent, so the database cascades nothing,
+    # and with passive_deletes even session.delete() leaves an unloaded body in place.
+    # Every delete path must remove bodies itself (as delete_news does), or it leaves
+    # orphan news_bodies rows.
+    body: Mapped["NewsBody"] = relationship(
+        back_populates="item",
+        primaryjoin="NewsItem.id == foreign(NewsBody.news_id)",
+        uselist=False,
+        lazy="raise",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+    @validates("published_at")
+    def _validate_published_at(self, key, value):
+        # Partition key can't be NULL; undated articles are filed under collection time
+        return parse_datetime(value) or utcnow()
+
+class NewsBody(Base):
+    __tablename__ = "news_bodies"
+
+    news_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)  # = news_items.id, not a SERIAL
+    codec: Mapped[str] = mapped_column(String(10), default="zlib", nullable=False)
+    raw_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    item: Mapped[NewsItem] = relationship(
+        back_populates="body",
+        primaryjoin="NewsItem.id == foreign(NewsBody.news_id)",
+        lazy="raise",
+    )
+
+    @classmethod
+    def from_text(cls, text: str | None) -> "NewsBody | None":
+        if not text:
+            return None
+        raw = text.encode("utf-8")
+        return cls(codec="zlib", raw_size=len(raw), data=zlib.compress(raw, 6))
+
+    @property
+    def text(self) -> str:
+        if self.codec != "zlib":
+            raise ValueError(f"Unknown body codec: {self.codec}")
+        return zlib.decompress(self.data).decode("utf-8")
+
+class NewsUrl(Base):
+    """
+    Global URL → news item registry; the primary key is what keeps URLs unique.
+    Each item has one "canonical" row plus "alias" rows for the raw spellings seen
+    in feeds, so later variants are recognized before downloading anything.
+    """
+    __tablename__ = "news_urls"
+
+    url: Mapped[str] = mapped_column(String(500), primary_key=True)
+    news_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    kind: Mapped[str] = mapped_column(String(10), default="alias", server_default="alias", nullable=False)
+
+class NewsEvent(Base):
+    """Append-only log of pipeline stage transitions; ids double as SSE event ids."""
+    __tablename__ = "news_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    news_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False, index=True)
+
+class TrendCount(Base):
+    """Per-bucket mention counters for symbols/tags, maintained by the tagger (see myagents.trending)."""
+    __tablename__ = "trend_counts"
+    __table_args__ = (Index("ix_trend_counts_scan", "kind", "granularity", "bucket"),)
+
+    kind: Mapped[str] = mapped_column(String(10), primary_key=True)  # "symbol" | "tag"
+    key: Mapped[str] = mapped_column(String(50), primary_key=True)
+    granularity: Mapped[str] = mapped_column(String(6), primary_key=True)  # "minute" | "hour"
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+def dialect_insert(table):
+    """INSERT supporting on_conflict_* on whichever backend is configured (Postgres or SQLite)."""
+    return (postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert)(table)
+
+def url_variants(item: NewsItem) -> set[str]:
+    return {u for u in (item.url, canonicalize_url(item.url), item.canonical_url) if u}
+
+@event.listens_for(NewsItem, "before_insert")
+def _fill_canonical_url(mapper, connection, target: NewsItem):
+    if not target.canonical_url:
+        target.canonical_url = canonicalize_url(target.url)
+
+@event.listens_for(NewsItem, "after_insert")
+def _register_news_url(mapper, connection, target: NewsItem):
+    # Runs inside the same flush/transaction, so a duplicate canonical URL raises
+    # IntegrityError and rolls back the news_items row too. Aliases never conflict.
+    connection.execute(
+        NewsUrl.__table__.insert().values(url=target.canonical_url, news_id=target.id, kind="canonical")
+    )
+    aliases = [
+        {"url": url, "news_id": target.id, "kind": "alias"}
+        for url in url_variants(target) - {target.canonical_url}
+    ]
+    if aliases:
+        connection.execute(dialect_insert(NewsUrl).on_conflict_do_nothing(index_elements=["url"]), aliases)
+
+# --- Stage helpers ---
+def ready_for(stage: str):
+    """WHERE clause for items waiting at `stage` whose retry backoff (if any) has expired."""
+    return and_(
+        NewsItem.stage == stage,
+        or_(NewsItem.next_retry_at.is_(None), NewsItem.next_retry_at <= utcnow()),
+    )
+
+def stage_done(stage: str) -> dict:
+    """Column values for an item that just reached `stage`."""
+    return {"stage": stage, "attempts": 0, "next_retry_at": None, "last_error": None}
+
+def stage_failed(item: NewsItem, step: str, error: str, permanent: bool = False) -> dict:
+    """Column values after a failed `step` attempt: back off, or park as failed after MAX_ATTEMPTS."""
+    attempts = (item.attempts or 0) + 1
+    values = {"attempts": attempts, "last_error": f"{step}: {error}"[:500]}
+    if permanent or attempts >= MAX_ATTEMPTS:
+        values.update(stage=STAGE_FAILED, next_retry_at=None)
+    else:
+        values["next_retry_at"] = utcnow() + RETRY_BASE * 2 ** (attempts - 1)
+    return values
+
+def apply_values(item: NewsItem, values: dict):
+    for key, value in values.items():
+        setattr(item, key, value)
+
+async def find_news_urls(session: AsyncSession, urls) -> dict[str, int]:
+    """Which of `urls` (raw or canonical) are already registered, and to which item; one query."""
+    result = await session.execute(select(NewsUrl.url, NewsUrl.news_id).where(NewsUrl.url.in_(set(urls))))
+    return dict(result.all())
+
+async def add_aliases(session: AsyncSession, news_id: int, urls):
+    """Remember extra spellings of a known article; ones already registered are left alone."""
+    rows = [{"url": url, "news_id": news_id, "kind": "alias"} for url in set(urls) if url]
+    if rows:
+        await session.execute(dialect_insert(NewsUrl).on_conflict_do_nothing(index_elements=["url"]), rows)
+
+async def load_content(session: AsyncSession, news_id: int) -> str | None:
+    """Explicitly fetch and decompress the full article text for one news item."""
+    body = await session.get(NewsBody, news_id)
+    return body.text if body else None
+
+async def load_contents(session: AsyncSession, news_ids) -> dict[int, str]:
+    """Same as load_content() for many items in one query; items without a body are absent."""
+    result = await session.execute(select(NewsBody).where(NewsBody.news_id.in_(list(news_ids))))
+    return {body.news_id: body.text for body in result.scalars()}
 
 async def create_tables():
+    from myagents.partitions import ensure_partitions
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await ensure_partitions()
 
 def parse_datetime(dt):
     if dt is None:
@@ -55,20 +245,23 @@ async def save_feed_items_to_db(items: list[dict]):
                 if not urls:
                     return
 
+                # Match on canonical spellings too, and skip repeats within this batch
+                variants = set(urls) | {canonicalize_url(url) for url in urls}
                 result = await session.execute(
-                    select(NewsItem.url).where(NewsItem.url.in_(urls))
+                    select(NewsUrl.url).where(NewsUrl.url.in_(variants))
                 )
                 existing_urls = set(row[0] for row in result.fetchall())
 
                 for item in items:
                     url = item.get('url')
-                    if not url or url in existing_urls:
+                    if not url or {url, canonicalize_url(url)} & existing_urls:
                         continue
+                    existing_urls |= {url, canonicalize_url(url)}
                     news_item = NewsItem(
                         title=item.get('title', 'No Title'),
                         source=item.get('source'),
                         published_at=parse_datetime(item.get('published_at')),
-                        content=item.get('content'),
+                        body=NewsBody.from_text(item.get('content')),
                         summary=item.get('summary'),
                         tags=item.get('tags', []),
                         symbols=item.get('symbols', []),
@@ -0,0 +1,216 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import timedelta
+from typing import AsyncIterator, Iterable
+
+import asyncpg
+from sqlalchemy import insert, select, delete, func, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from myagents.db import engine, async_session, NewsItem, NewsEvent, utcnow
+from myagents.serialization import NEWS_COLUMNS
+
+# Pipeline stages record an event row per item they touch. On Postgres the same
+# transaction sends NOTIFY, so listeners only hear about committed work; on other
+# databases events are handed to this process's broadcaster after commit.
+# Event ids follow commit order (see emit_events), so a client that has seen id N
+# has seen everything before it and can resume with Last-Event-ID.
+
+EVENT_CHANNEL = "news_events"
+EVENT_RETENTION_DAYS = int(os.getenv("NEWS_EVENT_RETENTION_DAYS", "7"))
+NOTIFY_BATCH = 100  # keeps each NOTIFY payload well under Postgres' 8000 byte limit
+EVENT_LOCK_KEY = 0x6E657773  # pg_advisory_xact_lock key serializing event-emitting commits
+REPLAY_PAGE = 1000
+HYDRATE_RETRIES = 2
+
+# === Emitting (pipeline side) ===
+async def emit_events(session: AsyncSession, kind: str, news_ids: Iterable[int]):
+    """
+    Record `kind` events for news_ids in the caller's transaction; they go out on commit.
+    Call it last, right before committing: on Postgres it holds a lock until then.
+    """
+    news_ids = list(news_ids)
+    if not news_ids:
+        return
+    if engine.dialect.name == "postgresql":
+        # Ids come from a sequence at INSERT but clients see events at COMMIT. Holding
+        # this lock from id assignment to commit means a lower id can never commit after
+        # a higher one, even with several stages (API + scheduler) writing at once.
+        await session.execute(select(func.pg_advisory_xact_lock(EVENT_LOCK_KEY)))
+    result = await session.execute(
+        insert(NewsEvent).returning(NewsEvent.id, NewsEvent.kind, NewsEvent.news_id),
+        [{"kind": kind, "news_id": news_id} for news_id in news_ids],
+    )
+    events = [{"id": row.id, "kind": row.kind, "news_id": row.news_id} for row in result]
+
+    if engine.dialect.name == "postgresql":
+        for i in range(0, len(events), NOTIFY_BATCH):
+            payload = json.dumps(events[i:i + NOTIFY_BATCH])
+            await session.execute(select(func.pg_notify(EVENT_CHANNEL, payload)))
+    else:
+        session.info.setdefault("pending_events", []).extend(events)
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_pending_events(session: Session):
+    events = session.info.pop("pending_events", None)
+    if events:
+        broadcaster.feed(events)
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_events(session: Session):
+    session.info.pop("pending_events", None)
+
+async def prune_events(days: int = EVENT_RETENTION_DAYS) -> int:
+    async with async_session() as session:
+        result = await session.execute(
+            delete(NewsEvent).where(NewsEvent.created_at < utcnow() - timedelta(days=days))
+        )
+        await session.commit()
+        return result.rowcount
+
+# === Broadcasting (API side) ===
+def serialize_item(row) -> dict:
+    return {
+        "id": row.id,
+        "title": row.title,
+        "source": row.source,
+        "published_at": row.published_at.isoformat() if row.published_at else None,
+        "summary": row.summary,
+        "tags": row.tags,
+        "symbols": row.symbols,
+        "url": row.url,
+        "provider": row.provider,
+        "publisher": row.publisher,
+    }
+
+async def hydrate(events: list[dict]) -> list[dict]:
+    """Attach current item data to events with one query for the whole batch."""
+    ids = {e["news_id"] for e in events}
+    async with async_session() as session:
+        rows = await session.execute(select(*NEWS_COLUMNS).where(NewsItem.id.in_(ids)))
+        items = {row.id: serialize_item(row) for row in rows}
+    return [{**e, "item": items.get(e["news_id"])} for e in events]
+
+class EventBroadcaster:
+    """
+    One per API worker: holds a single LISTEN connection (Postgres) and fans each
+    event out to every connected client's queue. A ring buffer of recent events
+    serves most Last-Event-ID resumes without touching the database.
+    """
+
+    def __init__(self, buffer_size: int = 1000, client_queue_size: int = 500):
+        self.clients: set[asyncio.Queue] = set()
+        self.recent: deque[dict] = deque(maxlen=buffer_size)
+        self.client_queue_size = client_queue_size
+        self._incoming: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._conn: asyncpg.Connection | None = None
+
+    async def start(self):
+        self._incoming = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+        if engine.dialect.name == "postgresql":
+            await self._listen()
+
+    async def stop(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    async def _listen(self):
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self._conn = await asyncpg.connect(dsn)
+        self._conn.add_termination_listener(lambda conn: asyncio.create_task(self._reconnect()))
+        await self._conn.add_listener(EVENT_CHANNEL, self._on_notify)
+
+    async def _reconnect(self):
+        self._conn = None
+        while self._worker is not None:
+            await asyncio.sleep(5)
+            try:
+                await self._listen()
+                return
+            except Exception as e:
+                logging.error(f"Event listener reconnect failed: {e}")
+
+    def _on_notify(self, conn, pid, channel, payload):
+        self.feed(json.loads(payload))
+
+    def feed(self, events: list[dict]):
+        if self._incoming is not None:
+            self._incoming.put_nowait(events)
+
+    async def _hydrate(self, events: list[dict]) -> list[dict]:
+        for attempt in range(HYDRATE_RETRIES + 1):
+            try:
+                return await hydrate(events)
+            except Exception as e:
+                logging.error(f"Failed to load items for events (attempt {attempt + 1}): {e}")
+                if attempt < HYDRATE_RETRIES:
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+        # Never drop ids (resumes assume none are missing): send them without item data,
+        # clients can still fetch /news/{news_id}
+        return [{**e, "item": None} for e in events]
+
+    async def _run(self):
+        # Single consumer keeps events in commit order and hydrates each batch once
+        while True:
+            events = await self._hydrate(await self._incoming.get())
+            for ev in events:
+                self.recent.append(ev)
+                for queue in list(self.clients):
+                    try:
+                        queue.put_nowait(ev)
+                    except asyncio.QueueFull:
+                        # Too slow to keep up: end its stream (None) and let it resume by id
+                        self.clients.discard(queue)
+                        while not queue.empty():
+                            queue.get_nowait()
+                        queue.put_nowait(None)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.client_queue_size)
+        self.clients.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.clients.discard(queue)
+
+    async def replay(self, last_event_id: int | None, page_size: int = REPLAY_PAGE) -> AsyncIterator[dict]:
+        """
+        Events after last_event_id: from the ring buffer when it reaches back far enough,
+        otherwise from the database a page at a time until caught up.
+        """
+        if last_event_id is None:
+            return
+        if self.recent and self.recent[0]["id"] <= last_event_id + 1:
+            for ev in [ev for ev in self.recent if ev["id"] > last_event_id]:
+                yield ev
+            return
+        while True:
+            async with async_session() as session:
+                rows = await session.execute(
+                    select(NewsEvent.id, NewsEvent.kind, NewsEvent.news_id)
+                    .where(NewsEvent.id > last_event_id)
+                    .order_by(NewsEvent.id)
+                    .limit(page_size)
+                )
+                events = [{"id": r.id, "kind": r.kind, "news_id": r.news_id} for r in rows]
+            if not events:
+                return
+            for ev in await hydrate(events):
+                yield ev
+            if len(events) < page_size:
+                return
+            last_event_id = events[-1]["id"]
+
+broadcaster = EventBroadcaster()
@@ -0,0 +1,151 @@
+import os
+import re
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Local, CPU-only pre-compression of article bodies before they go to the LLM:
+# score sentences by TF-IDF similarity to their article's centroid (plus a bit of
+# lead/title bias, since news puts the point up front) and keep the best ones
+# that fit a per-item token budget. Scoring is vectorized over a whole batch of
+# articles at once; batches run in a process pool so the event loop never blocks.
+
+TOKEN_BUDGET = int(os.getenv("SUMMARY_INPUT_TOKENS", "250"))  # per article
+TOP_K = int(os.getenv("SUMMARY_INPUT_SENTENCES", "6"))
+WORKERS = int(os.getenv("EXTRACTIVE_WORKERS", "0")) or None  # None = one per CPU
+POOL_CHUNK = 64  # articles per pool task
+MAX_SENTENCES = 300  # per article; the tail of very long pages is mostly boilerplate
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])[\"'”’)]*\s+(?=[\"'“‘(]?[A-Z0-9$])|\n{2,}")
+WORD_RE = re.compile(r"[a-z0-9$%][a-z0-9$%.'-]*[a-z0-9%]|[a-z0-9$%]")
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had has
+have having he her here hers him his how i if in into is it its itself just me more most my no nor
+not now of off on once only or other our out over own said same says she should so some such than
+that the their them then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your
+""".split())
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token; close enough for budgeting without a model-specific tokenizer."""
+    return (len(text) + 3) // 4
+
+def split_sentences(text: str) -> list[str]:
+    sentences = (s.strip() for s in SENTENCE_RE.split(text or ""))
+    return [s for s in sentences if len(s.split()) >= 4][:MAX_SENTENCES]
+
+def _select(sentences: list[str], scores: np.ndarray, budget: int, top_k: int) -> str:
+    chosen, used = [], 0
+    for i in np.argsort(-scores, kind="stable"):
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost > budget:
+            continue
+        chosen.append(i)
+        used += cost
+        if len(chosen) == top_k:
+            break
+    if not chosen:
+        # Every sentence is over budget on its own: keep the start of the best one
+        return sentences[int(np.argmax(scores))][:budget * 4]
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+def compress_batch(articles: list[tuple[str, str]], budget: int = TOKEN_BUDGET, top_k: int = TOP_K) -> list[str]:
+    """
+    (title, text) pairs → compressed texts, same order. Texts already within budget
+    come back unchanged; an empty result means there was nothing usable to extract.
+    """
+    results = [None] * len(articles)
+    docs = []  # (article index, title, sentences) for the ones that need scoring
+    for n, (title, text) in enumerate(articles):
+        text = (text or "").strip()
+        if estimate_tokens(text) <= budget:
+            results[n] = text
+            continue
+        sentences = split_sentences(text)
+        if len(sentences) <= 1:
+            # Unsplittable wall of text: plain truncation is the best we can do
+            results[n] = text[:budget * 4]
+            continue
+        docs.append((n, title or "", sentences))
+    if not docs:
+        return results
+
+    # Flatten every (sentence, word) occurrence of the batch into parallel arrays
+    vocab: dict[str, int] = {}
+    sent_doc, sent_pos, token_sent, token_word, title_keys = [], [], [], [], []
+    for d, (_, title, sentences) in enumerate(docs):
+        for w in WORD_RE.findall(title.lower()):
+            if w not in STOPWORDS:
+                title_keys.append((d, vocab.setdefault(w, len(vocab))))
+        for pos, sentence in enumerate(sentences):
+            s = len(sent_doc)
+            sent_doc.append(d)
+            sent_pos.append(pos)
+            for w in WORD_RE.findall(sentence.lower()):
+                if w not in STOPWORDS:
+                    token_sent.append(s)
+                    token_word.append(vocab.setdefault(w, len(vocab)))
+
+    n_sent, n_vocab = len(sent_doc), max(len(vocab), 1)
+    sent_doc = np.asarray(sent_doc, dtype=np.int64)
+    sent_pos = np.asarray(sent_pos, dtype=np.float64)
+    token_sent = np.asarray(token_sent, dtype=np.int64)
+    token_word = np.asarray(token_word, dtype=np.int64)
+
+    # Term frequency per (sentence, word) pair
+    pair_keys, tf = np.unique(token_sent * n_vocab + token_word, return_counts=True)
+    pair_sent, pair_word = pair_keys // n_vocab, pair_keys % n_vocab
+    pair_doc = sent_doc[pair_sent]
+
+    # IDF within each article: sentences are the "documents"
+    doc_word_keys, pair_to_doc_word, df = np.unique(
+        pair_doc * n_vocab + pair_word, return_inverse=True, return_counts=True
+    )
+    sentences_per_doc = np.bincount(sent_doc, minlength=len(docs))
+    idf = np.log1p(sentences_per_doc[pair_doc] / df[pair_to_doc_word])
+    weight = np.log1p(tf) * idf
+
+    # Words from the title count double
+    if title_keys:
+        title_keys = np.unique([d * n_vocab + w for d, w in title_keys])
+        weight *= np.where(np.isin(pair_doc * n_vocab + pair_word, title_keys), 2.0, 1.0)
+
+    # Cosine similarity of each sentence vector to its article's centroid
+    centroid = np.bincount(pair_to_doc_word, weights=weight, minlength=len(doc_word_keys))
+    dot = np.bincount(pair_sent, weights=weight * centroid[pair_to_doc_word], minlength=n_sent)
+    sent_norm = np.sqrt(np.bincount(pair_sent, weights=weight ** 2, minlength=n_sent))
+    doc_norm = np.sqrt(np.bincount(doc_word_keys // n_vocab, weights=centroid ** 2, minlength=len(docs)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.nan_to_num(dot / (sent_norm * doc_norm[sent_doc]))
+    scores *= 1.0 + 0.5 / (1.0 + sent_pos)  # lead bias
+
+    # Sentences were numbered article by article, so each article is a contiguous slice
+    end = np.cumsum(sentences_per_doc)
+    for d, (n, _, sentences) in enumerate(docs):
+        results[n] = _select(sentences, scores[end[d] - len(sentences):end[d]], budget, top_k)
+    return results
+
+# === Worker pool ===
+_pool: ProcessPoolExecutor | None = None
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Not fork: the event loop already runs executor threads, and forking a
+        # multi-threaded process can deadlock the children
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+    return _pool
+
+async def compress_texts(articles: list[tuple[str, str]], budget: int = TOKEN_BUDGET, top_k: int = TOP_K) -> list[str]:
+    """compress_batch() spread over the process pool in POOL_CHUNK-sized pieces."""
+    if not articles:
+        return []
+    loop = asyncio.get_running_loop()
+    parts = await asyncio.gather(*(
+        loop.run_in_executor(get_pool(), compress_batch, articles[i:i + POOL_CHUNK], budget, top_k)
+        for i in range(0, len(articles), POOL_CHUNK)
+    ))
+    return [text for part in parts for text in part]
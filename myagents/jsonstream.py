@@ -0,0 +1,166 @@
+import os
+import json
+import logging
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+# Structured LLM output, consumed while it streams: the model is asked for
+# {"items": [{"index": 1, ...}, ...]} under a JSON schema, and each array element
+# is parsed + validated the moment its closing brace arrives. One bad element
+# only costs that item; stream_each() re-asks just the items that never came back.
+
+T = TypeVar("T", bound=BaseModel)
+
+# Extra rounds for items whose element was missing or invalid (API errors are not retried here)
+ITEM_RETRIES = int(os.getenv("LLM_ITEM_RETRIES", "1"))
+
+def items_schema(properties: dict, required: list[str]) -> dict:
+    """JSON schema for {"items": [ {index, **properties} ]} (kept to the subset Gemini accepts)."""
+    return {
+        "type": "object",
+        "properties": {
+            "items": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"index": {"type": "integer"}, **properties},
+                    "required": ["index", *required],
+                },
+            }
+        },
+        "required": ["items"],
+    }
+
+class JsonArrayStream:
+    """
+    Incremental parser for the elements of the first JSON array in a text stream.
+    Anything before the array (code fences, a wrapping object) is skipped; only
+    object/array elements are emitted. Elements that don't parse are counted in
+    `malformed` and dropped.
+    """
+
+    def __init__(self):
+        self.malformed = 0
+        self._buf: list[str] = []
+        self._stack: list[str] = []  # open brackets of the current element; empty = between elements
+        self._in_array = False
+        self._in_string = False
+        self._escape = False
+        self._done = False
+
+    def feed(self, chunk: str) -> list:
+        elements = []
+        for ch in chunk:
+            if self._done:
+                break
+            if self._in_string:
+                if self._stack:
+                    self._buf.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+                if self._stack:
+                    self._buf.append(ch)
+                continue
+            if not self._in_array:
+                self._in_array = ch == "["
+                continue
+            if not self._stack:
+                if ch in "{[":
+                    self._stack = [ch]
+                    self._buf = [ch]
+                elif ch == "]":
+                    self._done = True
+                continue
+
+            self._buf.append(ch)
+            if ch in "{[":
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack.pop() != ("{" if ch == "}" else "["):
+                    # Mismatched bracket: give up on this element and resync at the next one
+                    self.malformed += 1
+                    self._stack, self._buf = [], []
+                elif not self._stack:
+                    try:
+                        elements.append(json.loads("".join(self._buf)))
+                    except json.JSONDecodeError:
+                        self.malformed += 1
+                    self._buf = []
+        return elements
+
+async def stream_items(
+    client,
+    prompt: str,
+    schema: dict,
+    model: type[T],
+    max_tokens: int,
+    temperature: float = 0,
+) -> AsyncIterator[T]:
+    """Yield each validated element of the response's items array as soon as it is complete."""
+    stream = await client.chat.completions.create(
+        model="gemini-2.0-flash",
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=max_tokens,
+        temperature=temperature,
+        response_format={"type": "json_schema", "json_schema": {"name": "items", "schema": schema}},
+        stream=True,
+    )
+    parser = JsonArrayStream()
+    async for chunk in stream:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        for element in parser.feed(chunk.choices[0].delta.content):
+            try:
+                item = model.model_validate(element)
+            except ValidationError as e:
+                first = e.errors()[0]
+                logging.warning(f"Dropping invalid {model.__name__} element: {first['loc']} {first['msg']}")
+                continue
+            yield item
+    if parser.malformed:
+        logging.warning(f"Dropped {parser.malformed} unparsable {model.__name__} elements")
+
+async def stream_each(
+    items: list,
+    stream: Callable[[list], AsyncIterator[tuple]],
+    save: Callable[..., Awaitable[None]],
+    retries: int = ITEM_RETRIES,
+) -> tuple[set[int], str | None]:
+    """
+    Run `stream(items)` (an async generator of (position, *values)) and await
+    save(item, *values) for each element as soon as it arrives. Items whose element
+    was missing or invalid are re-asked, alone, up to `retries` more times.
+
+    Errors raised by `save` propagate: a failed write isn't the model's fault. An
+    API/stream error ends the run but keeps what was saved. Returns the indexes of
+    the saved items and the stream error (None if the model just skipped items).
+    """
+    done: set[int] = set()
+    pending = list(range(len(items)))
+    for _ in range(1 + retries):
+        batch = [items[i] for i in pending]
+        elements = stream(batch)
+        try:
+            while True:
+                try:
+                    pos, *values = await anext(elements)
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    return done, str(e)
+                await save(batch[pos], *values)
+                done.add(pending[pos])
+        finally:
+            await elements.aclose()
+        pending = [i for i in pending if i not in done]
+        if not pending:
+            break
+    return done, None
@@ -0,0 +1,280 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import time
+from datetime import datetime, timezone
+from sqlalchemy import text, inspect, insert, select, delete, update, bindparam
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from myagents.db import engine, async_session, create_tables, utcnow, dialect_insert, NewsBody, NewsItem, NewsUrl, TrendCount
+from myagents.trending import bump_trending, HOUR_RETENTION
+from myagents.partitions import create_partitions, is_partitioned, add_months, month_start, PARTITION_MONTHS_AHEAD
+from myagents.urls import canonicalize_url
+
+# One-off schema migrations for existing databases.
+# Usage: uv run python -m myagents.migrations <name>
+
+BATCH_SIZE = 500
+
+# Best guess at an item's stage from the implicit state used before stages were
+# tracked: bullets mean the summarizer ran, any tag/symbol means the tagger ran.
+INFERRED_STAGE = (
+    "CASE "
+    "WHEN publisher THEN 'published' "
+    "WHEN cardinality(tags) > 0 OR cardinality(symbols) > 0 THEN 'tagged' "
+    "WHEN summary LIKE '%•%' THEN 'summarized' "
+    "ELSE 'collected' END"
+)
+
+# === Helpers ===
+async def get_columns(conn: AsyncConnection, table: str) -> list[str]:
+    return await conn.run_sync(lambda c: [col["name"] for col in inspect(c).get_columns(table)])
+
+async def measure_news_items(conn: AsyncConnection) -> dict:
+    """On-disk size (Postgres only) and a timed full scan of news_items."""
+    stats = {}
+    if conn.dialect.name == "postgresql":
+        stats["total_bytes"] = await conn.scalar(text(
+            "SELECT sum(pg_total_relation_size(relid)) FROM pg_partition_tree('news_items')"
+        ))
+    # Stream the scan so inline article bodies are never all held in memory at once
+    start = time.perf_counter()
+    result = await conn.stream(text("SELECT * FROM news_items").execution_options(yield_per=BATCH_SIZE))
+    count = 0
+    async for partition in result.partitions():
+        count += len(partition)
+    stats["scan_rows"] = count
+    stats["scan_seconds"] = round(time.perf_counter() - start, 4)
+    return stats
+
+def print_stats(label: str, stats: dict):
+    size = stats.get("total_bytes")
+    size_str = f"{size / 1024 / 1024:.2f} MB" if size is not None else "n/a"
+    print(f"{label}: size={size_str}, scanned {stats['scan_rows']} rows in {stats['scan_seconds']}s")
+
+# === Migrations ===
+async def migrate_bodies():
+    """Move news_items.content into compressed news_bodies rows and drop the inline column."""
+    await create_tables()  # creates news_bodies if missing
+
+    async with engine.begin() as conn:
+        if "content" not in await get_columns(conn, "news_items"):
+            print("news_items.content already migrated.")
+            return
+        before = await measure_news_items(conn)
+
+        moved, raw_bytes, stored_bytes, last_id = 0, 0, 0, 0
+        while True:
+            rows = (await conn.execute(
+                text(
+                    "SELECT id, content FROM news_items "
+                    "WHERE id > :last_id AND content IS NOT NULL AND content <> '' "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": BATCH_SIZE},
+            )).fetchall()
+            if not rows:
+                break
+
+            bodies = []
+            for news_id, content in rows:
+                body = NewsBody.from_text(content)
+                bodies.append({"news_id": news_id, "codec": body.codec, "raw_size": body.raw_size, "data": body.data})
+                raw_bytes += body.raw_size
+                stored_bytes += len(body.data)
+            await conn.execute(insert(NewsBody), bodies)
+            moved += len(rows)
+            last_id = rows[-1][0]
+
+        await conn.execute(text("ALTER TABLE news_items DROP COLUMN content"))
+
+    # Dropping a column doesn't shrink the heap; rewrite it so the size comparison is real
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM FULL ANALYZE news_items"))
+
+    async with engine.connect() as conn:
+        after = await measure_news_items(conn)
+
+    ratio = (stored_bytes / raw_bytes) if raw_bytes else 0
+    print(f"Moved {moved} article bodies ({raw_bytes} → {stored_bytes} bytes, ratio {ratio:.2f}).")
+    print_stats("Before", before)
+    print_stats("After", after)
+
+async def migrate_partitions():
+    """Rebuild news_items as a published_at range-partitioned table (Postgres only)."""
+    if engine.dialect.name != "postgresql":
+        print("Partitioning is only supported on Postgres.")
+        return
+
+    async with engine.begin() as conn:
+        if await is_partitioned(conn):
+            print("news_items is already partitioned.")
+            return
+        if "content" in await get_columns(conn, "news_items"):
+            print("Run the 'bodies' migration first.")
+            return
+        before = await measure_news_items(conn)
+
+        # Move the old table (and the names Postgres derived from it) out of the way
+        await conn.execute(text("ALTER TABLE news_items RENAME TO news_items_legacy"))
+        await conn.execute(text("ALTER TABLE news_items_legacy RENAME CONSTRAINT news_items_pkey TO news_items_legacy_pkey"))
+        await conn.execute(text("ALTER TABLE news_items_legacy DROP CONSTRAINT IF EXISTS news_items_url_key"))
+        await conn.execute(text("ALTER SEQUENCE IF EXISTS news_items_id_seq RENAME TO news_items_legacy_id_seq"))
+        await conn.execute(text("ALTER INDEX IF EXISTS ix_news_items_stage RENAME TO ix_news_items_legacy_stage"))
+        await conn.execute(text("ALTER TABLE news_bodies DROP CONSTRAINT IF EXISTS news_bodies_news_id_fkey"))
+        await conn.execute(text("UPDATE news_items_legacy SET published_at = now() AT TIME ZONE 'utc' WHERE published_at IS NULL"))
+
+        await conn.run_sync(lambda c: NewsItem.__table__.create(c))
+        await conn.run_sync(lambda c: NewsUrl.__table__.create(c, checkfirst=True))
+        oldest = await conn.scalar(text("SELECT min(published_at) FROM news_items_legacy"))
+        current = month_start(datetime.now(timezone.utc))
+        # Cap the backfill so one bogus 1970 date doesn't create hundreds of partitions
+        first = max(month_start(oldest), add_months(current, -36)) if oldest else current
+        await create_partitions(conn, first, add_months(current, PARTITION_MONTHS_AHEAD))
+
+        legacy_columns = set(await get_columns(conn, "news_items_legacy"))
+        columns = [c.name for c in NewsItem.__table__.columns if c.name in legacy_columns]
+        values = list(columns)
+        if "stage" not in legacy_columns:
+            # Pre-stages table: infer the stage while copying, since the new table's
+            # default would otherwise send the whole archive through the pipeline again
+            columns.append("stage")
+            values.append(INFERRED_STAGE)
+        await conn.execute(text(
+            f"INSERT INTO news_items ({', '.join(columns)}) SELECT {', '.join(values)} FROM news_items_legacy"
+        ))
+        await conn.execute(text(
+            "INSERT INTO news_urls (url, news_id) SELECT url, min(id) FROM news_items_legacy "
+            "GROUP BY url ON CONFLICT DO NOTHING"
+        ))
+        await conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('news_items', 'id'), "
+            "(SELECT COALESCE(max(id), 0) + 1 FROM news_items), false)"
+        ))
+        await conn.execute(text("DROP TABLE news_items_legacy"))
+
+    async with engine.connect() as conn:
+        after = await measure_news_items(conn)
+    print_stats("Before", before)
+    print_stats("After", after)
+
+async def migrate_trending():
+    """(Re)build trend_counts from already-tagged items inside the rollup retention window."""
+    await create_tables()
+    since = utcnow() - HOUR_RETENTION
+    stmt = (
+        select(NewsItem.published_at, NewsItem.symbols, NewsItem.tags)
+        .where(NewsItem.published_at >= since)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    counted = 0
+    async with async_session() as session:
+        await session.execute(delete(TrendCount))
+        result = await session.stream(stmt)
+        async for batch in result.partitions():
+            await bump_trending(session, batch)
+            counted += len(batch)
+        await session.commit()
+    print(f"Rebuilt trend_counts from {counted} items.")
+
+async def migrate_stages():
+    """Add the per-item pipeline stage columns and infer the stage of rows that predate them."""
+    async with engine.begin() as conn:
+        columns = await get_columns(conn, "news_items")
+        for name, ddl in (
+            ("stage", "VARCHAR(20) NOT NULL DEFAULT 'collected'"),
+            ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+            ("next_retry_at", "TIMESTAMP"),
+            ("last_error", "TEXT"),
+        ):
+            if name not in columns:
+                await conn.execute(text(f"ALTER TABLE news_items ADD COLUMN {name} {ddl}"))
+        # Infer only in the run that adds the column. The live pipeline's rows can look
+        # like later stages (feed snippets with "•"), so content is no marker on a re-run;
+        # the one other way to get a pre-stages table, rebuilding it with the 'partitions'
+        # migration, infers while copying.
+        inferred = 0
+        if "stage" not in columns:
+            result = await conn.execute(text(f"UPDATE news_items SET stage = {INFERRED_STAGE}"))
+            inferred = result.rowcount
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_news_items_stage ON news_items (stage, next_retry_at)"
+        ))
+        counts = (await conn.execute(text("SELECT stage, count(*) FROM news_items GROUP BY stage"))).fetchall()
+    print(f"Inferred stage for {inferred} items: " + ", ".join(f"{s}={n}" for s, n in counts))
+
+async def migrate_versions():
+    """Add the prompt version columns; existing rows stay NULL (= written by an unknown prompt)."""
+    async with engine.begin() as conn:
+        columns = await get_columns(conn, "news_items")
+        added = []
+        for name in ("summary_version", "tags_version"):
+            if name not in columns:
+                await conn.execute(text(f"ALTER TABLE news_items ADD COLUMN {name} VARCHAR(20)"))
+                added.append(name)
+    print(f"Added {', '.join(added)}." if added else "Prompt version columns already exist.")
+
+async def migrate_canonical():
+    """Fill news_items.canonical_url and register each item's canonical URL in news_urls."""
+    async with engine.begin() as conn:
+        if "canonical_url" not in await get_columns(conn, "news_items"):
+            await conn.execute(text("ALTER TABLE news_items ADD COLUMN canonical_url VARCHAR(500)"))
+        if "kind" not in await get_columns(conn, "news_urls"):
+            # Existing rows are the raw feed URLs; the ones that already are canonical get flipped below
+            await conn.execute(text("ALTER TABLE news_urls ADD COLUMN kind VARCHAR(10) NOT NULL DEFAULT 'alias'"))
+
+        items = NewsItem.__table__
+        set_canonical = (
+            update(items)
+            .where(items.c.id == bindparam("b_id"), items.c.published_at == bindparam("b_published_at"))
+            .values(canonical_url=bindparam("b_canonical"))
+        )
+        register = dialect_insert(NewsUrl)
+        register = register.on_conflict_do_update(
+            index_elements=["url"],
+            set_={"kind": "canonical"},
+            where=NewsUrl.news_id == register.excluded.news_id,  # a URL registered to another item stays with it
+        )
+
+        updated, last_id = 0, 0
+        while True:
+            rows = (await conn.execute(
+                select(items.c.id, items.c.published_at, items.c.url)
+                .where(items.c.id > last_id)
+                .order_by(items.c.id)
+                .limit(BATCH_SIZE)
+            )).fetchall()
+            if not rows:
+                break
+            canonical = {row.id: canonicalize_url(row.url) for row in rows}
+            await conn.execute(set_canonical, [
+                {"b_id": row.id, "b_published_at": row.published_at, "b_canonical": canonical[row.id]} for row in rows
+            ])
+            await conn.execute(register, [
+                {"url": url, "news_id": news_id, "kind": "canonical"} for news_id, url in canonical.items()
+            ])
+            updated += len(rows)
+            last_id = rows[-1].id
+
+        duplicates = await conn.scalar(text(
+            "SELECT count(*) FROM news_items i JOIN news_urls u ON u.url = i.canonical_url WHERE u.news_id <> i.id"
+        ))
+    print(f"Canonicalized {updated} URLs; {duplicates} existing items duplicate an older article (left in place).")
+
+MIGRATIONS = {
+    "bodies": migrate_bodies,
+    "partitions": migrate_partitions,
+    "trending": migrate_trending,
+    "stages": migrate_stages,
+    "versions": migrate_versions,
+    "canonical": migrate_canonical,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in MIGRATIONS:
+        print(f"Usage: python -m myagents.migrations [{'|'.join(MIGRATIONS)}]")
+        sys.exit(1)
+    asyncio.run(MIGRATIONS[sys.argv[1]]())
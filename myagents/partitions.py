@@ -0,0 +1,217 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import gzip
+import logging
+import json
+import re
+import zlib
+from datetime import date, datetime
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from myagents.db import engine, utcnow
+
+# news_items is range-partitioned by published_at month (Postgres only).
+# Future partitions are created ahead of time; old ones are archived and dropped
+# instead of running a big DELETE on the live table.
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("NEWS_PARTITION_MONTHS_AHEAD", "3"))
+RETENTION_MONTHS = int(os.getenv("NEWS_RETENTION_MONTHS", "12"))
+RETENTION_MODE = os.getenv("NEWS_RETENTION_MODE", "archive")  # "archive" or "drop"
+ARCHIVE_DIR = os.getenv("NEWS_ARCHIVE_DIR", "archive")
+
+DEFAULT_PARTITION = "news_items_default"
+PARTITION_RE = re.compile(r"^news_items_(\d{4})_(\d{2})$")
+
+# === Month helpers ===
+def month_start(d: date | datetime) -> date:
+    return date(d.year, d.month, 1)
+
+def add_months(d: date, months: int) -> date:
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"news_items_{month.year}_{month.month:02d}"
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    """False on SQLite and on Postgres databases that haven't run the 'partitions' migration."""
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(await conn.scalar(text(
+        "SELECT count(*) FROM pg_partitioned_table WHERE partrelid = to_regclass('news_items')"
+    )))
+
+# === Partition creation ===
+async def create_partition(conn: AsyncConnection, month: date) -> str:
+    """
+    Create one month's partition. Rows for that month that already landed in the
+    default partition (because nobody created the month in time) are moved into it
+    first; otherwise Postgres refuses the new partition.
+    """
+    name = partition_name(month)
+    bounds = {"start": month, "end": add_months(month, 1)}
+    if await conn.scalar(text(f"SELECT to_regclass('{name}')")):
+        return name
+    stranded = False
+    if await conn.scalar(text(f"SELECT to_regclass('{DEFAULT_PARTITION}')")):
+        stranded = await conn.scalar(text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE published_at >= :start AND published_at < :end)"
+        ), bounds)
+    if not stranded:
+        await conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF news_items "
+            f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+        ))
+        return name
+
+    # Build the month as a plain table, move its rows out of the default partition,
+    # then attach it (ATTACH re-checks the default partition, which no longer overlaps)
+    await conn.execute(text(f"CREATE TABLE {name} (LIKE news_items INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = await conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE published_at >= :start AND published_at < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds)
+    await conn.execute(text(
+        f"ALTER TABLE news_items ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+    ))
+    logging.warning(f"Moved {moved.rowcount} rows from {DEFAULT_PARTITION} into new partition {name}")
+    return name
+
+async def create_partitions(conn: AsyncConnection, first_month: date, last_month: date) -> list[str]:
+    created = []
+    month = month_start(first_month)
+    while month <= last_month:
+        created.append(await create_partition(conn, month))
+        month = add_months(month, 1)
+    # Catches anything outside the monthly ranges (very old or far-future dates)
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF news_items DEFAULT"))
+    return created
+
+async def ensure_partitions(months_ahead: int = PARTITION_MONTHS_AHEAD) -> list[str]:
+    """
+    Make sure this month and the next `months_ahead` months have partitions.
+    Errors are logged rather than raised: callers (API startup, scheduler, pipeline
+    runs) should keep going, since new rows still fit in the default partition.
+    """
+    current = month_start(utcnow())
+    try:
+        async with engine.begin() as conn:
+            if not await is_partitioned(conn):
+                return []
+            return await create_partitions(conn, current, add_months(current, months_ahead))
+    except SQLAlchemyError as e:
+        logging.error(f"Failed to create news_items partitions: {e}")
+        return []
+
+async def list_partitions(conn: AsyncConnection) -> list[tuple[str, date]]:
+    rows = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'news_items'::regclass"
+    ))
+    partitions = []
+    for (name,) in rows:
+        match = PARTITION_RE.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+async def list_detached(conn: AsyncConnection) -> list[tuple[str, date]]:
+    """Monthly tables left detached by a retention run that failed before dropping them."""
+    rows = await conn.execute(text(
+        "SELECT relname FROM pg_class "
+        "WHERE relkind = 'r' AND NOT relispartition AND relname ~ '^news_items_[0-9]{4}_[0-9]{2}$'"
+    ))
+    tables = []
+    for (name,) in rows:
+        match = PARTITION_RE.match(name)
+        if match:
+            tables.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(tables, key=lambda p: p[1])
+
+# === Retention ===
+async def archive_rows(conn: AsyncConnection, table: str, where: str, path: str, params: dict | None = None) -> int:
+    """Write matching rows (with decompressed article text) to a gzipped NDJSON file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    result = await conn.stream(text(
+        f"SELECT p.*, b.codec AS body_codec, b.data AS body_data FROM {table} p "
+        f"LEFT JOIN news_bodies b ON b.news_id = p.id WHERE {where}"
+    ), params or {})
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        async for row in result.mappings():
+            record = {k: v for k, v in row.items() if not k.startswith("body_")}
+            record["content"] = zlib.decompress(row["body_data"]).decode("utf-8") if row["body_data"] else None
+            fh.write(json.dumps(record, default=str) + "\n")
+            count += 1
+    return count
+
+async def delete_side_rows(conn: AsyncConnection, table: str, where: str, params: dict | None = None):
+    ids = f"SELECT id FROM {table} WHERE {where}"
+    await conn.execute(text(f"DELETE FROM news_bodies WHERE news_id IN ({ids})"), params or {})
+    await conn.execute(text(f"DELETE FROM news_urls WHERE news_id IN ({ids})"), params or {})
+
+async def apply_retention(
+    keep_months: int = RETENTION_MONTHS,
+    mode: str = RETENTION_MODE,
+    archive_dir: str = ARCHIVE_DIR,
+) -> list[str]:
+    """
+    Detach monthly partitions older than `keep_months`, archive them when mode ==
+    "archive", then drop them. Tables a failed run left detached are picked up again,
+    and old rows that landed in the default partition are handled too.
+    """
+    cutoff = add_months(month_start(utcnow()), -keep_months)
+    retired = []
+
+    async with engine.connect() as conn:
+        if not await is_partitioned(conn):
+            return []
+        partitions = [(name, month) for name, month in await list_partitions(conn) if month < cutoff]
+        leftovers = [(name, month) for name, month in await list_detached(conn) if month < cutoff]
+
+    for name, month in leftovers + partitions:
+        # Detach first (a brief lock): from then on nothing can write to the partition,
+        # and reading the standalone table blocks nothing on news_items
+        if (name, month) in partitions:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"ALTER TABLE news_items DETACH PARTITION {name}"))
+        if mode == "archive":
+            async with engine.connect() as conn:
+                count = await archive_rows(conn, name, "TRUE", os.path.join(archive_dir, f"{name}.ndjson.gz"))
+            print(f"🗄️ Archived {count} rows from {name}")
+        # Only reached once the archive is written; if that failed, the next run retries the detached table
+        async with engine.begin() as conn:
+            await delete_side_rows(conn, name, "TRUE")
+            await conn.execute(text(f"DROP TABLE {name}"))
+        retired.append(name)
+
+    where, params = "p.published_at < :cutoff", {"cutoff": cutoff}
+    async with engine.begin() as conn:
+        if not await conn.scalar(text(f"SELECT count(*) FROM {DEFAULT_PARTITION} p WHERE {where}"), params):
+            return retired
+        if mode == "archive":
+            # One file per run: earlier runs already deleted the rows they archived
+            stamp = utcnow().strftime("%Y%m%dT%H%M%S")
+            path = os.path.join(archive_dir, f"{DEFAULT_PARTITION}_before_{cutoff.isoformat()}_{stamp}.ndjson.gz")
+            count = await archive_rows(conn, DEFAULT_PARTITION, where, path, params)
+            print(f"🗄️ Archived {count} old rows from {DEFAULT_PARTITION}")
+        await delete_side_rows(conn, f"{DEFAULT_PARTITION} p", where, params)
+        await conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} p WHERE {where}"), params)
+
+    return retired
+
+async def main():
+    created = await ensure_partitions()
+    print(f"Partitions ensured: {', '.join(created) or 'none (news_items not partitioned)'}")
+    retired = await apply_retention()
+    print(f"Partitions retired: {', '.join(retired) or 'none'}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
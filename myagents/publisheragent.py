@@ -5,11 +5,12 @@ import logging
 import asyncio
 from typing import List
 # import httpx  # Commented out since we won't do HTTP requests
-from sqlalchemy import update, select, and_
+from sqlalchemy import update, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
-from myagents.db import async_session, NewsItem
+from myagents.db import async_session, NewsItem, ready_for, stage_done, stage_failed, STAGE_TAGGED, STAGE_PUBLISHED
+from myagents.events import emit_events
 from myagents.taggeragent import run_tagger  
 
 logging.basicConfig(
@@ -23,14 +24,8 @@ logging.getLogger("sqlalchemy.engine").setLevel(logging.ERROR)
 # FUNDEDFLOW_API_KEY = os.getenv("FUNDEDFLOW_API_KEY")
 
 async def get_unpublished_news(session: AsyncSession, limit: int = 10) -> List[NewsItem]:
-    stmt = select(NewsItem).where(
-        and_(
-            NewsItem.publisher.is_(False),
-            NewsItem.url.isnot(None),
-            NewsItem.url != '',
-            NewsItem.url != 'None'
-        )
-    ).limit(limit)
+    # Invalid URLs are picked up too, so they get parked as failed instead of sitting here forever
+    stmt = select(NewsItem).where(ready_for(STAGE_TAGGED)).order_by(NewsItem.id).limit(limit)
     result = await session.execute(stmt)
     return result.scalars().all()
 
@@ -53,15 +48,25 @@ async def run_publisher(limit: int = 10) -> int:
                 print("No unpublished news found.")
                 return 0
 
+            published_ids = []
             for item in unpublished:
                 success = await publish_to_fundedflow(item)
                 if success:
                     await session.execute(
                         update(NewsItem)
                         .where(NewsItem.id == item.id)
-                        .values(publisher=True)
+                        .values(publisher=True, **stage_done(STAGE_PUBLISHED))
                     )
+                    published_ids.append(item.id)
                     published_count += 1
+                else:
+                    # The only rejection is a missing/invalid URL, which retrying won't fix
+                    await session.execute(
+                        update(NewsItem)
+                        .where(NewsItem.id == item.id)
+                        .values(**stage_failed(item, "publish", "missing or invalid URL", permanent=True))
+                    )
+            await emit_events(session, "published", published_ids)
             await session.commit()
     except Exception as e:
         logging.error(f"Unexpected error in publisher: {e}")
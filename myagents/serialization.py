@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import msgspec
+
+from myagents.db import NewsItem
+
+# Fast read path for the API: select only these columns as plain Core rows and
+# encode them straight to JSON bytes with a precompiled msgspec schema.
+# Field order of NewsOut must match NEWS_COLUMNS (rows are passed positionally).
+
+NEWS_COLUMNS = (
+    NewsItem.id,
+    NewsItem.title,
+    NewsItem.source,
+    NewsItem.published_at,
+    NewsItem.summary,
+    NewsItem.tags,
+    NewsItem.symbols,
+    NewsItem.url,
+    NewsItem.provider,
+    NewsItem.publisher,
+)
+
+class NewsOut(msgspec.Struct):
+    id: int
+    title: str
+    source: str | None
+    published_at: datetime | None
+    summary: str | None
+    tags: list[str] | None
+    symbols: list[str] | None
+    url: str
+    provider: str | None
+    publisher: bool
+
+json_encoder = msgspec.json.Encoder()
+
+def encode_news_rows(rows) -> bytes:
+    """Encode (NEWS_COLUMNS-shaped) rows to a JSON array, same shape as serialize_news()."""
+    return json_encoder.encode([NewsOut(*row) for row in rows])
@@ -0,0 +1,117 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from myagents.db import engine, async_session, TrendCount, utcnow, dialect_insert
+
+# Time-bucketed symbol/tag counters. The tagger bumps them as it writes results,
+# so "what's hot" and per-symbol timelines read O(buckets) rows instead of
+# aggregating the ARRAY columns over every article.
+
+MINUTE_RETENTION = timedelta(days=int(os.getenv("TRENDING_MINUTE_DAYS", "2")))
+HOUR_RETENTION = timedelta(days=int(os.getenv("TRENDING_HOUR_DAYS", "90")))
+MAX_MINUTE_WINDOW = timedelta(hours=6)  # longer windows read hour buckets
+
+WINDOW_RE = re.compile(r"^(\d+)([mhd])$")
+WINDOW_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+# === Helpers ===
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+def parse_window(window: str) -> timedelta:
+    """'15m', '1h', '7d' → timedelta. Raises ValueError for anything else."""
+    match = WINDOW_RE.match(window.strip().lower())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid window '{window}', expected e.g. 15m, 1h, 7d")
+    return timedelta(**{WINDOW_UNITS[match.group(2)]: int(match.group(1))})
+
+def normalize_key(kind: str, key: str) -> str:
+    key = key.strip()
+    return key.upper() if kind == "symbol" else key.lower()
+
+# === Writing (tagger side) ===
+async def bump_trending(
+    session: AsyncSession,
+    entries: Iterable[tuple[datetime | None, list[str], list[str]]],
+    delta: int = 1,
+):
+    """
+    Add `delta` per (published_at, symbols, tags) entry to the minute and hour buckets.
+    Runs in the caller's transaction; pass delta=-1 to retract counts before re-tagging.
+    """
+    counts = Counter()
+    now = utcnow()
+    for published_at, symbols, tags in entries:
+        ts = min(published_at or now, now)  # future-dated feeds shouldn't sit in "upcoming" buckets
+        for kind, keys in (("symbol", symbols or []), ("tag", tags or [])):
+            for key in {normalize_key(kind, k) for k in keys if k and k.strip()}:
+                for granularity in ("minute", "hour"):
+                    counts[(kind, key[:50], granularity, bucket_start(ts, granularity))] += delta
+    if not counts:
+        return
+
+    rows = [
+        {"kind": kind, "key": key, "granularity": granularity, "bucket": bucket, "count": count}
+        for (kind, key, granularity, bucket), count in counts.items()
+    ]
+    stmt = dialect_insert(TrendCount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["kind", "key", "granularity", "bucket"],
+        set_={"count": TrendCount.count + stmt.excluded.count},
+    )
+    await session.execute(stmt, rows)
+
+async def prune_trending() -> int:
+    now = utcnow()
+    async with async_session() as session:
+        result = await session.execute(
+            delete(TrendCount).where(
+                ((TrendCount.granularity == "minute") & (TrendCount.bucket < now - MINUTE_RETENTION))
+                | ((TrendCount.granularity == "hour") & (TrendCount.bucket < now - HOUR_RETENTION))
+            )
+        )
+        await session.commit()
+        return result.rowcount
+
+# === Reading (API side) ===
+async def get_trending(kind: str, window: timedelta, limit: int = 20) -> list[dict]:
+    granularity = "minute" if window <= MAX_MINUTE_WINDOW else "hour"
+    since = bucket_start(utcnow() - window, granularity)
+    total = func.sum(TrendCount.count).label("count")
+    stmt = (
+        select(TrendCount.key, total)
+        .where(TrendCount.kind == kind, TrendCount.granularity == granularity, TrendCount.bucket >= since)
+        .group_by(TrendCount.key)
+        .having(total > 0)
+        .order_by(total.desc(), TrendCount.key)
+        .limit(limit)
+    )
+    async with engine.connect() as conn:
+        rows = await conn.execute(stmt)
+        return [{"key": row.key, "count": row.count} for row in rows]
+
+async def get_timeline(kind: str, key: str, window: timedelta, granularity: str) -> list[dict]:
+    since = bucket_start(utcnow() - window, granularity)
+    stmt = (
+        select(TrendCount.bucket, TrendCount.count)
+        .where(
+            TrendCount.kind == kind,
+            TrendCount.key == normalize_key(kind, key),
+            TrendCount.granularity == granularity,
+            TrendCount.bucket >= since,
+        )
+        .order_by(TrendCount.bucket)
+    )
+    async with engine.connect() as conn:
+        rows = await conn.execute(stmt)
+        return [{"bucket": row.bucket.isoformat(), "count": row.count} for row in rows if row.count > 0]
@@ -0,0 +1,101 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+
+# One spelling per article, so the same story behind utm_* tags, AMP pages, trailing
+# slashes or redirect wrappers is only downloaded, summarized and tagged once.
+# Pure string work — no network; HTTP-only redirects (feedproxy, t.co) are caught
+# later through the article's <link rel="canonical">.
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "cmpid", "ncid", "ocid", "soc_src", "soc_trk", "sr_share", "smid", "taid",
+    "ref", "ref_src", "referrer", "src", "rss",
+    ".tsrc", "tsrc", "yptr", "guccounter", "mod",
+    "amp", "outputtype", "__twitter_impression",
+}
+TRACKING_PREFIXES = ("utm_", "guce_", "_hs", "__", "mkt_", "pk_", "itm_")
+
+# host → query params that carry the real target
+REDIRECT_HOSTS = {
+    "news.google.com": ("url",),
+    "google.com": ("url", "q"),
+    "l.facebook.com": ("u",),
+    "lm.facebook.com": ("u",),
+    "out.reddit.com": ("url",),
+    "l.messenger.com": ("u",),
+    "linkedin.com": ("url",),
+    "feeds.feedblitz.com": ("url",),
+    "feedproxy.google.com": ("url",),
+    "finance.yahoo.com": ("url",),
+    "news.yahoo.com": ("url",),
+    "r.search.yahoo.com": (),  # target is in the path: /.../RU=<quoted url>/RK=...
+}
+YAHOO_RU_RE = re.compile(r"/RU=([^/]+)/")
+AMP_CACHE_RE = re.compile(r"^/[cv]/(?:s/)?(.+)$")  # <site>.cdn.ampproject.org/c/s/<host>/<path>
+AMP_PATH_RE = re.compile(r"^/amp(?=/)|(?:/amp|\.amp)(?=/?$)", re.IGNORECASE)
+MAX_UNWRAP = 3
+
+def _is_tracking(key: str) -> bool:
+    key = key.lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+def _unwrap(url: str) -> str | None:
+    """Target URL hidden in a known redirect wrapper, or None."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower().removeprefix("www.")
+    if host.endswith(".cdn.ampproject.org"):
+        match = AMP_CACHE_RE.match(parts.path)
+        return f"https://{match.group(1)}" if match else None
+    if host == "r.search.yahoo.com":
+        match = YAHOO_RU_RE.search(parts.path)
+        return unquote(match.group(1)) if match else None
+    for key, value in parse_qsl(parts.query):
+        if key in REDIRECT_HOSTS.get(host, ()) and value.startswith(("http://", "https://")):
+            return value
+    return None
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalized form used for dedupe: https, lowercase host without www./amp./m.,
+    no default port, fragment, tracking params or AMP suffix, sorted query,
+    no trailing slash. Returns the input stripped if it isn't an http(s) URL.
+    """
+    url = (url or "").strip()
+    for _ in range(MAX_UNWRAP):
+        target = _unwrap(url)
+        if not target:
+            break
+        url = target.strip()
+
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        return url
+
+    host = parts.hostname.lower().rstrip(".")
+    for prefix in ("www.", "amp.", "m."):
+        if host.startswith(prefix) and host.count(".") > 1:
+            host = host[len(prefix):]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    path = AMP_PATH_RE.sub("", path)
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking(key)
+    )
+    return urlunsplit(("https", host, path or "/", urlencode(query), ""))
+
+def usable_canonical(link: str | None, page_url: str) -> str | None:
+    """
+    Canonicalized <link rel="canonical"> if it looks trustworthy. Some sites point
+    every page at their homepage or emit relative/garbage values; ignore those.
+    """
+    if not link or not link.startswith(("http://", "https://")):
+        return None
+    canonical = canonicalize_url(link)
+    if urlsplit(canonical).path in ("", "/") and urlsplit(canonicalize_url(page_url)).path not in ("", "/"):
+        return None
+    return canonical
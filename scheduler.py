@@ -1,10 +1,17 @@
 import asyncio
 import datetime
 from main import run_pipeline  # Adjust if needed
+from myagents.partitions import ensure_partitions, apply_retention
+from myagents.events import prune_events
+from myagents.trending import prune_trending
 
 async def job():
     print(f"⏰ Running job at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    await ensure_partitions()  # next months' partitions exist before rows arrive
     await run_pipeline()
+    await apply_retention()  # archive + drop partitions past NEWS_RETENTION_MONTHS
+    await prune_events()  # stream resume history older than NEWS_EVENT_RETENTION_DAYS
+    await prune_trending()  # minute buckets after 2 days, hour buckets after 90
 
 async def scheduler():
     while True: